@@ -1,4 +1,6 @@
 """Fixed demo script for Windows PowerShell compatibility."""
+import contextlib
+import io
 import json
 import os
 import subprocess
@@ -6,27 +8,29 @@ import sys
 import time
 from datetime import datetime
 
-def run_command(cmd):
-    """Run queuectl command and return output."""
-    result = subprocess.run(
-        f'python queuectl.py {cmd}',
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    print(f"Command: {cmd}")
-    print(f"Output: {result.stdout}")
-    if result.stderr:
-        print(f"Error: {result.stderr}")
-    return result.stdout.strip()
+from queue.cli import CLI
+
+def run_command(cli, args):
+    """Run queuectl command in-process and return output."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            cli.run(args)
+        except SystemExit:
+            pass
+    print(f"Command: {' '.join(args)}")
+    print(f"Output: {output.getvalue()}")
+    return output.getvalue().strip()
 
 def main():
     """Run demo scenarios."""
     print("\n=== QueueCTL Demo ===\n")
 
     # Ensure we start fresh
-    if os.path.exists("jobs.db"):
-        os.remove("jobs.db")
+    for path in ("jobs.db", "jobs.db-wal", "jobs.db-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    cli = CLI()
 
     # Test 1: Basic successful job
     print("\n1. Testing basic successful job...")
@@ -34,7 +38,7 @@ def main():
         "id": "job1",
         "command": "echo Hello World"
     }
-    run_command(f'enqueue \'{json.dumps(job)}\'')
+    run_command(cli, ["enqueue", json.dumps(job)])
     
     # Start worker
     print("\nStarting worker...")
@@ -47,8 +51,8 @@ def main():
     # Wait for job to complete
     time.sleep(2)
     print("\nChecking job status...")
-    run_command("status")
-    run_command("list --state completed")
+    run_command(cli, ["status"])
+    run_command(cli, ["list", "--state", "completed"])
 
     # Test 2: Failed job with retry
     print("\n2. Testing failed job with retry...")
@@ -56,12 +60,12 @@ def main():
         "id": "job2",
         "command": "nonexistent_command"
     }
-    run_command(f'enqueue \'{json.dumps(job)}\'')
+    run_command(cli, ["enqueue", json.dumps(job)])
     
     # Wait for retries and DLQ
     time.sleep(5)
     print("\nChecking DLQ...")
-    run_command("dlq list")
+    run_command(cli, ["dlq", "list"])
 
     # Test 3: Multiple workers
     print("\n3. Testing multiple workers...")
@@ -74,7 +78,7 @@ def main():
             "id": f"multi{i}",
             "command": f"echo Job {i} && timeout 2"
         }
-        run_command(f'enqueue \'{json.dumps(job)}\'')
+        run_command(cli, ["enqueue", json.dumps(job)])
     
     # Start multiple workers
     print("\nStarting 3 workers...")
@@ -87,8 +91,8 @@ def main():
     # Wait for jobs to complete
     time.sleep(4)
     print("\nFinal status:")
-    run_command("status")
-    run_command("list --state completed")
+    run_command(cli, ["status"])
+    run_command(cli, ["list", "--state", "completed"])
     
     # Clean up
     worker_process.terminate()
@@ -1,81 +1,99 @@
 """Command-line interface for the job queue system."""
 import argparse
+import functools
 import json
 import logging
 import sys
 import uuid
-from typing import Optional
+from typing import List, Optional
 
-from .db import Database
+from .db import JOB_STATES, Database
 from .worker import WorkerManager
 
 logger = logging.getLogger(__name__)
 
-class CLI:
-    """CLI handler for the queue system."""
-    
-    def __init__(self):
-        """Initialize CLI with database connection."""
-        self.db = Database()
-        self.worker_manager = WorkerManager(self.db)
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser once and reuse it for every run."""
+    parser = argparse.ArgumentParser(
+        description="QueueCTL - Background Job Queue System"
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Commands")
+
+    # Enqueue command
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add a new job to the queue")
+    enqueue_parser.add_argument("job_json", nargs="?", help="Job specification as JSON string")
+    enqueue_parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="JSONL file with one job specification per line"
+    )
 
-    def run(self):
-        """Parse and handle CLI commands."""
-        parser = argparse.ArgumentParser(
-            description="QueueCTL - Background Job Queue System"
-        )
-        subparsers = parser.add_subparsers(dest="command", help="Commands")
+    # Worker commands
+    worker_parser = subparsers.add_parser("worker", help="Worker management")
+    worker_subparsers = worker_parser.add_subparsers(dest="worker_command")
+    
+    worker_start = worker_subparsers.add_parser("start", help="Start worker processes")
+    worker_start.add_argument(
+        "--count",
+        type=int,
+        default=1,
+        help="Number of workers to start"
+    )
+    worker_start.add_argument(
+        "--workers-mode",
+        choices=["process", "thread"],
+        default="process",
+        help="Run workers as separate processes (default) or threads"
+    )
+    
+    worker_subparsers.add_parser("stop", help="Stop all workers")
 
-        # Enqueue command
-        enqueue_parser = subparsers.add_parser("enqueue", help="Add a new job to the queue")
-        enqueue_parser.add_argument("job_json", help="Job specification as JSON string")
+    # Status command
+    subparsers.add_parser("status", help="Show queue status")
 
-        # Worker commands
-        worker_parser = subparsers.add_parser("worker", help="Worker management")
-        worker_subparsers = worker_parser.add_subparsers(dest="worker_command")
-        
-        worker_start = worker_subparsers.add_parser("start", help="Start worker processes")
-        worker_start.add_argument(
-            "--count",
-            type=int,
-            default=1,
-            help="Number of workers to start"
-        )
-        
-        worker_subparsers.add_parser("stop", help="Stop all workers")
+    # List jobs command
+    list_parser = subparsers.add_parser("list", help="List jobs")
+    list_parser.add_argument(
+        "--state",
+        choices=JOB_STATES,
+        help="Filter by job state"
+    )
 
-        # Status command
-        subparsers.add_parser("status", help="Show queue status")
+    # DLQ commands
+    dlq_parser = subparsers.add_parser("dlq", help="Dead Letter Queue operations")
+    dlq_subparsers = dlq_parser.add_subparsers(dest="dlq_command")
+    
+    dlq_subparsers.add_parser("list", help="List jobs in DLQ")
+    
+    dlq_retry = dlq_subparsers.add_parser("retry", help="Retry a job from DLQ")
+    dlq_retry.add_argument("job_id", help="ID of the job to retry")
 
-        # List jobs command
-        list_parser = subparsers.add_parser("list", help="List jobs")
-        list_parser.add_argument(
-            "--state",
-            choices=["pending", "processing", "completed", "failed", "dead"],
-            help="Filter by job state"
-        )
+    # Config commands
+    config_parser = subparsers.add_parser("config", help="Manage configuration")
+    config_subparsers = config_parser.add_subparsers(dest="config_command")
+    
+    config_set = config_subparsers.add_parser("set", help="Set config value")
+    config_set.add_argument("key", help="Config key")
+    config_set.add_argument("value", help="Config value")
+    
+    config_get = config_subparsers.add_parser("get", help="Get config value")
+    config_get.add_argument("key", help="Config key")
 
-        # DLQ commands
-        dlq_parser = subparsers.add_parser("dlq", help="Dead Letter Queue operations")
-        dlq_subparsers = dlq_parser.add_subparsers(dest="dlq_command")
-        
-        dlq_subparsers.add_parser("list", help="List jobs in DLQ")
-        
-        dlq_retry = dlq_subparsers.add_parser("retry", help="Retry a job from DLQ")
-        dlq_retry.add_argument("job_id", help="ID of the job to retry")
+    return parser
 
-        # Config commands
-        config_parser = subparsers.add_parser("config", help="Manage configuration")
-        config_subparsers = config_parser.add_subparsers(dest="config_command")
-        
-        config_set = config_subparsers.add_parser("set", help="Set config value")
-        config_set.add_argument("key", help="Config key")
-        config_set.add_argument("value", help="Config value")
-        
-        config_get = config_subparsers.add_parser("get", help="Get config value")
-        config_get.add_argument("key", help="Config key")
+class CLI:
+    """CLI handler for the queue system."""
+    
+    def __init__(self):
+        """Initialize CLI with database connection."""
+        self.db = Database()
+        self.worker_manager = WorkerManager(self.db)
 
-        args = parser.parse_args()
+    def run(self, argv: Optional[List[str]] = None):
+        """Parse and handle CLI commands (from sys.argv unless argv is given)."""
+        parser = _build_parser()
+        args = parser.parse_args(argv)
 
         if not args.command:
             parser.print_help()
@@ -101,12 +119,15 @@ class CLI:
 
     def _handle_enqueue(self, args):
         """Handle job enqueue command."""
+        if args.batch:
+            self._handle_enqueue_batch(args.batch)
+            return
+        if not args.job_json:
+            print("Error: Job JSON or --batch file required")
+            sys.exit(1)
+
         try:
-            job_data = json.loads(args.job_json)
-            if "id" not in job_data:
-                job_data["id"] = str(uuid.uuid4())
-            if "command" not in job_data:
-                raise ValueError("Job must include 'command' field")
+            job_data = self._parse_job(args.job_json)
                 
             if self.db.enqueue(job_data):
                 print(f"Job {job_data['id']} enqueued successfully")
@@ -121,15 +142,49 @@ class CLI:
             print(f"Error enqueueing job: {e}")
             sys.exit(1)
 
+    def _handle_enqueue_batch(self, path: str):
+        """Enqueue every job in a JSONL file in one transaction."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                jobs = [self._parse_job(line) for line in f if line.strip()]
+
+            if not jobs:
+                print("No jobs found in batch file")
+                return
+
+            if self.db.enqueue_many(jobs):
+                print(f"{len(jobs)} job(s) enqueued successfully")
+            else:
+                print("Failed to enqueue batch (an ID may already exist)")
+                sys.exit(1)
+
+        except json.JSONDecodeError:
+            print("Error: Invalid JSON format in batch file")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error enqueueing batch: {e}")
+            sys.exit(1)
+
+    def _parse_job(self, job_json: str) -> dict:
+        """Parse and validate a single job specification."""
+        job_data = json.loads(job_json)
+        if "id" not in job_data:
+            job_data["id"] = str(uuid.uuid4())
+        if "command" not in job_data:
+            raise ValueError("Job must include 'command' field")
+        return job_data
+
     def _handle_worker(self, args):
         """Handle worker management commands."""
         if args.worker_command == "start":
             try:
-                self.worker_manager.start_workers(args.count)
-                print(f"Started {args.count} worker(s)")
+                self.worker_manager.start_workers(args.count, args.workers_mode)
+                print(f"Started {args.count} worker(s)", flush=True)
             except Exception as e:
                 print(f"Error starting workers: {e}")
                 sys.exit(1)
+            # Supervise until the workers exit or a signal stops them
+            self.worker_manager.wait_for_workers()
         elif args.worker_command == "stop":
             try:
                 self.worker_manager.stop_workers()
@@ -141,13 +196,7 @@ class CLI:
     def _handle_status(self):
         """Show queue status."""
         try:
-            stats = {
-                "pending": len(self.db.list_jobs("pending")),
-                "processing": len(self.db.list_jobs("processing")),
-                "completed": len(self.db.list_jobs("completed")),
-                "failed": len(self.db.list_jobs("failed")),
-                "dead": len(self.db.list_jobs("dead"))
-            }
+            stats = self.db.status_snapshot()
             
             print("\nQueue Status:")
             print("-" * 40)
@@ -155,8 +204,8 @@ class CLI:
                 print(f"{state.capitalize():12} : {count}")
             
             # Show processing jobs with more detail
-            processing_jobs = self.db.list_jobs("processing")
-            if processing_jobs:
+            if stats["processing"]:
+                processing_jobs = self.db.list_jobs("processing")
                 print("\nCurrently Processing Jobs:")
                 for job in processing_jobs:
                     print(f"- Job {job['id']} (Worker: {job['worker_id']})")
@@ -170,14 +219,12 @@ class CLI:
     def _handle_list(self, args):
         """Handle job listing command."""
         try:
-            jobs = self.db.list_jobs(args.state)
-            if not jobs:
-                print("No jobs found")
-                return
-                
-            print("\nJobs:")
-            print("-" * 80)
-            for job in jobs:
+            found = False
+            for job in self.db.iter_jobs(args.state):
+                if not found:
+                    print("\nJobs:")
+                    print("-" * 80)
+                    found = True
                 print(
                     f"ID: {job['id']}\n"
                     f"Command: {job['command']}\n"
@@ -187,6 +234,9 @@ class CLI:
                     f"Updated: {job['updated_at']}\n"
                     f"{'-' * 80}"
                 )
+
+            if not found:
+                print("No jobs found")
                 
         except Exception as e:
             print(f"Error listing jobs: {e}")
@@ -200,14 +250,12 @@ class CLI:
             
         try:
             if args.dlq_command == "list":
-                jobs = self.db.list_jobs("dead")
-                if not jobs:
-                    print("DLQ is empty")
-                    return
-                    
-                print("\nDead Letter Queue:")
-                print("-" * 80)
-                for job in jobs:
+                found = False
+                for job in self.db.iter_jobs("dead"):
+                    if not found:
+                        print("\nDead Letter Queue:")
+                        print("-" * 80)
+                        found = True
                     print(
                         f"ID: {job['id']}\n"
                         f"Command: {job['command']}\n"
@@ -215,12 +263,18 @@ class CLI:
                         f"Attempts: {job['attempts']}/{job['max_retries']}\n"
                         f"{'-' * 80}"
                     )
+
+                if not found:
+                    print("DLQ is empty")
             
             elif args.dlq_command == "retry":
                 if self.db.retry_dlq_job(args.job_id):
                     print(f"Job {args.job_id} moved back to pending queue")
+                elif not self.db.job_exists(args.job_id):
+                    print(f"Failed to retry job {args.job_id}: no such job")
+                    sys.exit(1)
                 else:
-                    print(f"Failed to retry job {args.job_id}")
+                    print(f"Failed to retry job {args.job_id}: not in DLQ")
                     sys.exit(1)
                     
         except Exception as e:
@@ -1,8 +1,191 @@
 """Database module for job persistence and state management."""
 import json
 import sqlite3
-from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+# Rows pulled per lock acquisition while streaming jobs
+_ITER_BATCH_SIZE = 256
+
+JOB_STATES = ("pending", "processing", "completed", "failed", "dead")
+
+# Seconds a config value read from the database is reused. Writes from this
+# process are seen immediately; writes from other processes show up once
+# the entry expires.
+CONFIG_CACHE_TTL = 15.0
+
+# Seconds a status snapshot is reused. Writes made through this Database
+# invalidate it; writes from other processes show up once it expires.
+STATUS_CACHE_TTL = 2.0
+
+# Cached marker for keys that have no stored value
+_MISSING = object()
+
+# UPDATE ... RETURNING lets a worker claim a job in one statement (SQLite 3.35+).
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# SQL text is kept constant so the connection's statement cache always hits.
+_SQL_CREATE_JOBS = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        max_retries INTEGER DEFAULT 3,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        worker_id INTEGER,
+        last_error TEXT,
+        next_retry_at TEXT
+    )
+"""
+
+_SQL_CREATE_CONFIG = """
+    CREATE TABLE IF NOT EXISTS config (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+"""
+
+# Serves the failed branches of the worker poll (ordered by retry time) and,
+# through its leading column, state-filtered listings.
+_SQL_CREATE_READY_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_jobs_ready
+    ON jobs (state, next_retry_at, created_at)
+"""
+
+# Serves the pending branch of the worker poll (oldest first).
+_SQL_CREATE_PENDING_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_jobs_pending
+    ON jobs (state, created_at)
+"""
+
+_SQL_ENQUEUE = """
+    INSERT INTO jobs (
+        id, command, state, attempts, max_retries,
+        created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_GET_JOB = "SELECT * FROM jobs WHERE id = ?"
+
+_SQL_JOB_EXISTS = "SELECT 1 FROM jobs WHERE id = ? LIMIT 1"
+
+_SQL_LIST_ALL = "SELECT * FROM jobs"
+
+_SQL_LIST_BY_STATE = "SELECT * FROM jobs WHERE state = ?"
+
+_SQL_COUNT_BY_STATE = "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+
+_SQL_UPDATE_STATE = """
+    UPDATE jobs SET
+        state = ?,
+        updated_at = ?,
+        worker_id = ?,
+        last_error = ?
+    WHERE id = ?
+"""
+
+_SQL_UPDATE_STATE_INC = """
+    UPDATE jobs SET
+        state = ?,
+        updated_at = ?,
+        worker_id = ?,
+        last_error = ?,
+        attempts = attempts + 1
+    WHERE id = ?
+"""
+
+_SQL_RECORD_FAILURE = """
+    UPDATE jobs SET
+        state = ?,
+        updated_at = ?,
+        worker_id = NULL,
+        last_error = ?,
+        attempts = attempts + 1,
+        next_retry_at = ?
+    WHERE id = ?
+"""
+
+# Picks the next runnable job. Each branch is a single index range read
+# with LIMIT 1, so the poll never scans or sorts the table; the outer
+# ORDER BY only compares the (at most three) branch winners.
+_SQL_PICK_READY = """
+    SELECT id FROM (
+        SELECT * FROM (
+            SELECT id, created_at FROM jobs
+            WHERE state = 'pending'
+            ORDER BY created_at LIMIT 1
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT id, created_at FROM jobs
+            WHERE state = 'failed' AND next_retry_at IS NULL
+              AND attempts < max_retries
+            ORDER BY created_at LIMIT 1
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT id, created_at FROM jobs
+            WHERE state = 'failed' AND next_retry_at <= ?
+              AND attempts < max_retries
+            ORDER BY next_retry_at LIMIT 1
+        )
+    )
+    ORDER BY created_at LIMIT 1
+"""
+
+_SQL_CLAIM = f"""
+    UPDATE jobs SET
+        state = 'processing',
+        worker_id = ?,
+        updated_at = ?
+    WHERE id = ({_SQL_PICK_READY})
+    RETURNING *
+"""
+
+_SQL_FETCH = f"SELECT * FROM jobs WHERE id = ({_SQL_PICK_READY})"
+
+_SQL_LOCK = """
+    UPDATE jobs SET
+        state = 'processing',
+        worker_id = ?,
+        updated_at = ?
+    WHERE id = ? AND state IN ('pending', 'failed')
+"""
+
+_SQL_SET_RETRY = "UPDATE jobs SET next_retry_at = ? WHERE id = ?"
+
+_SQL_RETRY_DLQ = """
+    UPDATE jobs SET
+        state = 'pending',
+        attempts = 0,
+        worker_id = NULL,
+        last_error = NULL,
+        next_retry_at = NULL,
+        updated_at = ?
+    WHERE id = ? AND state = 'dead'
+"""
+
+_SQL_NEXT_RETRY = """
+    SELECT MIN(next_retry_at) FROM jobs
+    WHERE state = 'failed' AND attempts < max_retries
+"""
+
+_SQL_GET_CONFIG = "SELECT value FROM config WHERE key = ?"
+
+_SQL_SET_CONFIG = "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)"
+
+def _row_to_dict(cursor: sqlite3.Cursor, row: tuple) -> Dict[str, Any]:
+    """Map a plain result tuple to a dict keyed by the cursor's column names."""
+    return dict(zip([d[0] for d in cursor.description], row))
+
+def _rollback(conn: sqlite3.Connection):
+    """Roll back the open transaction, if SQLite has not already done so."""
+    if conn.in_transaction:
+        conn.execute("ROLLBACK")
 
 class Database:
     """SQLite database manager for job queue."""
@@ -10,167 +193,241 @@ class Database:
     def __init__(self, db_path: str = "jobs.db"):
         """Initialize database connection and create tables if needed."""
         self.db_path = db_path
+        self._conn = self._connect()
+        self._lock = threading.Lock()
+        # Signalled when work becomes available to workers in this process
+        self._cond = threading.Condition()
+        self._config_cache: Dict[str, Tuple[Any, float]] = {}
+        self._config_cache_lock = threading.Lock()
+        self._status_cache: Optional[Tuple[Dict[str, int], float]] = None
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a connection to the database file."""
+        # One shared autocommit connection; the lock serializes worker threads.
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+        return conn
+
     def _init_db(self):
-        """Create database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS jobs (
-                    id TEXT PRIMARY KEY,
-                    command TEXT NOT NULL,
-                    state TEXT NOT NULL,
-                    attempts INTEGER DEFAULT 0,
-                    max_retries INTEGER DEFAULT 3,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    worker_id TEXT,
-                    last_error TEXT,
-                    next_retry_at TEXT
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS config (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL
-                )
-            """)
-            conn.commit()
+        """Create tables if they don't exist."""
+        with self._lock:
+            conn = self._conn
+            # Create the schema in one transaction rather than one per statement
+            conn.execute("BEGIN")
+            try:
+                conn.execute(_SQL_CREATE_JOBS)
+                conn.execute(_SQL_CREATE_CONFIG)
+                conn.execute(_SQL_CREATE_READY_INDEX)
+                conn.execute(_SQL_CREATE_PENDING_INDEX)
+                conn.execute("COMMIT")
+            except BaseException:
+                _rollback(conn)
+                raise
+
+            # Refresh planner statistics only where they are missing or stale
+            conn.execute("PRAGMA optimize")
 
     def enqueue(self, job_data: Dict[str, Any]) -> bool:
         """Add a new job to the queue."""
+        return self.enqueue_many([job_data])
+
+    def enqueue_many(self, jobs: List[Dict[str, Any]]) -> bool:
+        """Add several jobs to the queue in a single transaction."""
         now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (
+                job_data["id"],
+                job_data["command"],
+                "pending",
+                0,
+                job_data.get("max_retries", 3),
+                now,
+                now
+            )
+            for job_data in jobs
+        ]
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN")
             try:
-                conn.execute(
-                    """
-                    INSERT INTO jobs (
-                        id, command, state, attempts, max_retries,
-                        created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        job_data["id"],
-                        job_data["command"],
-                        "pending",
-                        0,
-                        job_data.get("max_retries", 3),
-                        now,
-                        now
-                    )
-                )
-                conn.commit()
-                return True
+                conn.executemany(_SQL_ENQUEUE, rows)
+                conn.execute("COMMIT")
             except sqlite3.IntegrityError:
+                _rollback(conn)
                 return False
+            except BaseException:
+                # Never leave the shared connection inside a transaction
+                _rollback(conn)
+                raise
+
+        self._status_cache = None
+        self.notify_workers(len(rows))
+        return True
 
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get a job by ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        with self._lock:
+            conn = self._conn
+            cursor = conn.execute(_SQL_GET_JOB, (job_id,))
             row = cursor.fetchone()
-            return dict(row) if row else None
+            return _row_to_dict(cursor, row) if row else None
+
+    def job_exists(self, job_id: str) -> bool:
+        """Check whether a job exists without fetching its row."""
+        with self._lock:
+            cursor = self._conn.execute(_SQL_JOB_EXISTS, (job_id,))
+            return cursor.fetchone() is not None
 
     def list_jobs(self, state: Optional[str] = None) -> List[Dict[str, Any]]:
         """List jobs, optionally filtered by state."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            query = "SELECT * FROM jobs"
-            params = []
-            
+        return list(self.iter_jobs(state))
+
+    def iter_jobs(self, state: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream jobs one at a time, optionally filtered by state."""
+        with self._lock:
+            conn = self._conn
             if state:
-                query += " WHERE state = ?"
-                params.append(state)
-                
-            cursor = conn.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+                cursor = conn.execute(_SQL_LIST_BY_STATE, (state,))
+            else:
+                cursor = conn.execute(_SQL_LIST_ALL)
+
+        columns = [d[0] for d in cursor.description]
+        try:
+            while True:
+                # Hold the lock only while stepping the cursor, never across a yield
+                with self._lock:
+                    rows = cursor.fetchmany(_ITER_BATCH_SIZE)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            cursor.close()
+
+    def count_by_state(self) -> Dict[str, int]:
+        """Count jobs in each state, including states with no jobs."""
+        counts = dict.fromkeys(JOB_STATES, 0)
+        with self._lock:
+            for state, count in self._conn.execute(_SQL_COUNT_BY_STATE):
+                counts[state] = count
+        return counts
+
+    def status_snapshot(self) -> Dict[str, int]:
+        """Job counts per state, reused for a couple of seconds."""
+        cached = self._status_cache
+        now = time.monotonic()
+        if cached and now - cached[1] < STATUS_CACHE_TTL:
+            return dict(cached[0])
+        counts = self.count_by_state()
+        self._status_cache = (counts, now)
+        return dict(counts)
 
     def update_job_state(self, job_id: str, state: str, error: Optional[str] = None,
-                        worker_id: Optional[str] = None, increment_attempts: bool = False) -> bool:
+                        worker_id: Optional[int] = None, increment_attempts: bool = False) -> bool:
         """Update job state and related fields."""
         now = datetime.now(timezone.utc).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock:
+            conn = self._conn
             try:
-                query = """
-                    UPDATE jobs SET
-                        state = ?,
-                        updated_at = ?,
-                        worker_id = ?,
-                        last_error = ?
-                """
-                params = [state, now, worker_id, error]
-                
-                if increment_attempts:
-                    query += ", attempts = attempts + 1"
-                    
-                query += " WHERE id = ?"
-                params.append(job_id)
-                
-                cursor = conn.execute(query, params)
-                conn.commit()
+                query = _SQL_UPDATE_STATE_INC if increment_attempts else _SQL_UPDATE_STATE
+                cursor = conn.execute(query, (state, now, worker_id, error, job_id))
+                self._status_cache = None
                 return cursor.rowcount > 0
             except sqlite3.Error:
                 return False
 
-    def fetch_and_lock_job(self, worker_id: str) -> Optional[Dict[str, Any]]:
+    def fetch_and_lock_job(self, worker_id: int) -> Optional[Dict[str, Any]]:
         """Fetch next available job and lock it to a worker."""
         now = datetime.now(timezone.utc).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._lock:
+            conn = self._conn
             
-            # First try pending jobs
-            cursor = conn.execute(
-                """
-                SELECT * FROM jobs 
-                WHERE state = 'pending'
-                   OR (state = 'failed' 
-                       AND attempts < max_retries 
-                       AND (next_retry_at IS NULL OR next_retry_at <= ?))
-                ORDER BY created_at ASC
-                LIMIT 1
-                """,
-                (now,)
-            )
+            if _HAS_RETURNING:
+                # Select and claim in a single atomic statement
+                cursor = conn.execute(_SQL_CLAIM, (worker_id, now, now))
+                # Drain the cursor so the statement finishes and autocommits
+                rows = cursor.fetchall()
+                if not rows:
+                    return None
+                self._status_cache = None
+                return _row_to_dict(cursor, rows[0])
             
-            row = cursor.fetchone()
-            if not row:
-                return None
+            # Older SQLite: take the write lock up front so no other process
+            # can claim the same row between the SELECT and the UPDATE.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(_SQL_FETCH, (now,))
                 
-            job = dict(row)
-            
-            # Lock the job
-            conn.execute(
-                """
-                UPDATE jobs SET
-                    state = 'processing',
-                    worker_id = ?,
-                    updated_at = ?
-                WHERE id = ? AND (state = 'pending' OR state = 'failed')
-                """,
-                (worker_id, now, job["id"])
-            )
-            conn.commit()
+                row = cursor.fetchone()
+                if not row:
+                    conn.execute("COMMIT")
+                    return None
+                    
+                job = _row_to_dict(cursor, row)
+                
+                # Lock the job
+                conn.execute(_SQL_LOCK, (worker_id, now, job["id"]))
+                conn.execute("COMMIT")
+                self._status_cache = None
+            except BaseException:
+                _rollback(conn)
+                raise
             
             return job
 
     def set_next_retry(self, job_id: str, retry_at: str) -> bool:
         """Set the next retry time for a failed job."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock:
+            conn = self._conn
             try:
-                conn.execute(
-                    "UPDATE jobs SET next_retry_at = ? WHERE id = ?",
-                    (retry_at, job_id)
+                conn.execute(_SQL_SET_RETRY, (retry_at, job_id))
+            except sqlite3.Error:
+                return False
+
+        self.notify_workers()
+        return True
+
+    def record_failure(self, job_id: str, error: str,
+                       retry_delay: Optional[float] = None) -> bool:
+        """Record a failed attempt in one write.
+
+        The job is scheduled for retry after ``retry_delay`` seconds, or moved
+        to the dead letter queue when no delay is given.
+        """
+        now = datetime.now(timezone.utc)
+        if retry_delay is None:
+            state, retry_at = "dead", None
+        else:
+            state = "failed"
+            retry_at = (now + timedelta(seconds=retry_delay)).isoformat()
+
+        with self._lock:
+            conn = self._conn
+            try:
+                cursor = conn.execute(
+                    _SQL_RECORD_FAILURE,
+                    (state, now.isoformat(), error, retry_at, job_id)
                 )
-                conn.commit()
-                return True
             except sqlite3.Error:
                 return False
 
+        self._status_cache = None
+        if retry_at is not None:
+            self.notify_workers()
+        return cursor.rowcount > 0
+
     def move_to_dlq(self, job_id: str, error: str) -> bool:
         """Move a job to the dead letter queue."""
         return self.update_job_state(
@@ -182,48 +439,77 @@ class Database:
 
     def retry_dlq_job(self, job_id: str) -> bool:
         """Move a job from DLQ back to pending state."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock:
+            conn = self._conn
             try:
-                conn.execute(
-                    """
-                    UPDATE jobs SET
-                        state = 'pending',
-                        attempts = 0,
-                        worker_id = NULL,
-                        last_error = NULL,
-                        next_retry_at = NULL,
-                        updated_at = ?
-                    WHERE id = ? AND state = 'dead'
-                    """,
+                cursor = conn.execute(
+                    _SQL_RETRY_DLQ,
                     (datetime.now(timezone.utc).isoformat(), job_id)
                 )
-                conn.commit()
-                return True
             except sqlite3.Error:
                 return False
 
+        if cursor.rowcount == 0:
+            return False
+
+        self._status_cache = None
+        self.notify_workers()
+        return True
+
+    def next_retry_at(self) -> Optional[str]:
+        """Get the earliest scheduled retry time among retryable jobs."""
+        with self._lock:
+            cursor = self._conn.execute(_SQL_NEXT_RETRY)
+            return cursor.fetchone()[0]
+
+    def wait_for_work(self, timeout: float):
+        """Block until another thread signals new work or the timeout expires."""
+        with self._cond:
+            self._cond.wait(timeout=timeout)
+
+    def notify_workers(self, n: int = 1):
+        """Wake up to n workers waiting in this process."""
+        with self._cond:
+            self._cond.notify(n)
+
     def get_config(self, key: str, default: Any = None) -> Any:
-        """Get a configuration value."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT value FROM config WHERE key = ?",
-                (key,)
-            )
-            row = cursor.fetchone()
-            return json.loads(row[0]) if row else default
+        """Get a configuration value, served from a short-lived cache."""
+        now = time.monotonic()
+        with self._config_cache_lock:
+            cached = self._config_cache.get(key)
+        if cached and now - cached[1] < CONFIG_CACHE_TTL:
+            value = cached[0]
+        else:
+            with self._lock:
+                conn = self._conn
+                cursor = conn.execute(_SQL_GET_CONFIG, (key,))
+                row = cursor.fetchone()
+            value = json.loads(row[0]) if row else _MISSING
+            with self._config_cache_lock:
+                self._config_cache[key] = (value, now)
+        return default if value is _MISSING else value
 
     def set_config(self, key: str, value: Any) -> bool:
         """Set a configuration value."""
-        with sqlite3.connect(self.db_path) as conn:
+        serialized = json.dumps(value)
+        with self._lock:
+            conn = self._conn
             try:
-                conn.execute(
-                    """
-                    INSERT OR REPLACE INTO config (key, value)
-                    VALUES (?, ?)
-                    """,
-                    (key, json.dumps(value))
-                )
-                conn.commit()
-                return True
+                conn.execute(_SQL_SET_CONFIG, (key, serialized))
             except sqlite3.Error:
-                return False
\ No newline at end of file
+                return False
+
+        # Cache what was actually stored, as every other reader will decode it
+        with self._config_cache_lock:
+            self._config_cache[key] = (json.loads(serialized), time.monotonic())
+        return True
+
+    def close(self):
+        """Close the shared database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self):
+        """Replace a closed connection with a fresh one."""
+        with self._lock:
+            self._conn = self._connect()
\ No newline at end of file
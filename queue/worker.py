@@ -1,40 +1,134 @@
 """Worker process management and job execution."""
 import logging
+import multiprocessing
 import os
+import random
+import re
+import shlex
+import shutil
 import signal
 import subprocess
-import sys
 import time
-import uuid
-from datetime import datetime, timezone, timedelta
-from threading import Event, Thread
-from typing import Optional, Dict, List
+from datetime import datetime, timezone
+from threading import TIMEOUT_MAX, Event, Thread
+from typing import Optional, Dict, List, Tuple
 
 from .db import Database
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on an idle wait. Jobs enqueued by other processes (e.g. the CLI)
+# can't signal this process, so idle workers still re-check this often.
+MAX_IDLE_WAIT = 1.0
+
+# Characters that give a command meaning beyond "program plus plain words"
+_SHELL_CHARS = frozenset("|&;<>()$`\\\"'*?[]{}~#=\n")
+
+
+def _needs_shell(command: str) -> bool:
+    """Check whether a command uses any shell syntax."""
+    return any(c in _SHELL_CHARS for c in command)
+
+
+def _do_echo(args: List[str]) -> Tuple[int, str]:
+    """In-process ``echo`` without options."""
+    if args and args[0].startswith("-"):
+        raise ValueError("echo options are left to the shell")
+    return 0, " ".join(args) + "\n"
+
+
+_SLEEP_DURATION = re.compile(r"\d+(\.\d*)?|\.\d+")
+
+
+def _do_sleep(args: List[str]) -> Tuple[int, str]:
+    """In-process ``sleep`` for a single plain number of seconds."""
+    if len(args) != 1:
+        raise ValueError("sleep takes exactly one duration")
+    # float() also takes spellings like "1_000" or "-0" that sleep rejects
+    if not _SLEEP_DURATION.fullmatch(args[0]):
+        raise ValueError("sleep duration is not a plain decimal")
+    seconds = float(args[0])
+    # The regex rules out negatives; time.sleep() overflows past this
+    if seconds > TIMEOUT_MAX:
+        raise ValueError("sleep duration out of range")
+    time.sleep(seconds)
+    return 0, ""
+
+
+# Trivial commands serviced without forking. A handler raises ValueError
+# for arguments it does not support, and the command goes to the shell.
+_BUILTINS = {
+    "echo": _do_echo,
+    "sleep": _do_sleep,
+    "true": lambda args: (0, ""),
+    "false": lambda args: (1, ""),
+}
+
+
+def _spawn(command: str) -> subprocess.CompletedProcess:
+    """Run a command and capture its output, skipping the shell when possible."""
+    # Python's own descriptors are non-inheritable (PEP 446), so there is
+    # nothing to close in the child on POSIX. Leaving close_fds off lets
+    # subprocess launch via posix_spawn instead of fork + close loop + exec.
+    options = dict(
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        close_fds=os.name != "posix"
+    )
+
+    if os.name == "posix" and not _needs_shell(command):
+        argv = shlex.split(command)
+        # subprocess only uses posix_spawn for an executable with a directory
+        # part. Programs not on PATH (e.g. shell builtins) go to the shell,
+        # which runs them or reports them the usual way.
+        program = shutil.which(argv[0]) if argv else None
+        if program:
+            return subprocess.run(argv, executable=program, **options)
+
+    return subprocess.run(command, shell=True, **options)
+
+
+def _run_builtin(command: str) -> Optional[subprocess.CompletedProcess]:
+    """Run a shell-free trivial command in-process, if it is one."""
+    if os.name != "posix" or _needs_shell(command):
+        return None
+    argv = shlex.split(command)
+    handler = _BUILTINS.get(argv[0]) if argv else None
+    if handler is None:
+        return None
+    try:
+        returncode, stdout = handler(argv[1:])
+    except ValueError:
+        return None
+    return subprocess.CompletedProcess(argv, returncode, stdout, "")
+
+
 class Worker:
     """Individual worker process that executes jobs."""
     
-    def __init__(self, db: Database):
-        """Initialize worker with database connection."""
+    def __init__(self, db: Database, shutdown_event=None):
+        """Initialize worker with database connection and optional shared shutdown event."""
         self.db = db
-        self.id = str(uuid.uuid4())
+        # 63 random bits fit SQLite's signed 64-bit INTEGER
+        self.id = random.getrandbits(63)
+        # Set by stop() for this worker only
         self.stop_event = Event()
+        # Set by the manager to stop every worker process at once
+        self.shutdown_event = shutdown_event
         self.current_job: Optional[Dict] = None
 
     def start(self):
         """Start the worker loop."""
         logger.info(f"Worker {self.id} starting")
         
-        while not self.stop_event.is_set():
+        while not self._should_stop():
             try:
                 # Try to get and lock a job
                 job = self.db.fetch_and_lock_job(self.id)
                 if not job:
-                    # No jobs available, wait a bit
-                    time.sleep(1)
+                    # No jobs available, wait for a wakeup or the next retry
+                    self.db.wait_for_work(self._idle_wait())
                     continue
 
                 self.current_job = job
@@ -51,20 +145,33 @@ class Worker:
         """Signal the worker to stop after current job."""
         logger.info(f"Worker {self.id} stopping...")
         self.stop_event.set()
+        self.db.notify_workers()
+
+    def _should_stop(self) -> bool:
+        """Check whether this worker or the whole pool has been stopped."""
+        if self.stop_event.is_set():
+            return True
+        return self.shutdown_event is not None and self.shutdown_event.is_set()
+
+    def _idle_wait(self) -> float:
+        """Seconds to wait before polling again when the queue is empty."""
+        next_retry = self.db.next_retry_at()
+        if not next_retry:
+            return MAX_IDLE_WAIT
+        delay = (
+            datetime.fromisoformat(next_retry) - datetime.now(timezone.utc)
+        ).total_seconds()
+        return min(max(delay, 0.0), MAX_IDLE_WAIT)
 
     def _process_job(self, job: Dict):
         """Process a single job with retries and backoff."""
         logger.info(f"Processing job {job['id']}")
         
         try:
-            # Execute the command
-            process = subprocess.run(
-                job["command"],
-                shell=True,
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
+            # Execute the command, in-process when it is a trivial builtin
+            process = _run_builtin(job["command"])
+            if process is None:
+                process = _spawn(job["command"])
             
             logger.info(f"Job {job['id']} output: {process.stdout}")
             if process.stderr:
@@ -93,25 +200,25 @@ class Worker:
 
     def _handle_failure(self, job: Dict, error: str):
         """Handle job failure with retry logic."""
-        self.db.update_job_state(
-            job_id=job["id"],
-            state="failed",
-            error=error,
-            worker_id=None,
-            increment_attempts=True
-        )
-        
         # Check if we should move to DLQ
         if job["attempts"] + 1 >= job["max_retries"]:
-            self.db.move_to_dlq(job["id"], error)
+            self.db.record_failure(job["id"], error)
             return
             
-        # Calculate next retry time with exponential backoff
+        # Calculate retry delay with exponential backoff
         base = self.db.get_config("backoff_base", 2)
         delay = base ** (job["attempts"] + 1)  # exponential backoff
-        next_retry = datetime.now(timezone.utc) + timedelta(seconds=delay)
         
-        self.db.set_next_retry(job["id"], next_retry.isoformat())
+        self.db.record_failure(job["id"], error, retry_delay=delay)
+
+def _run_worker(db_path: str, shutdown_event):
+    """Entry point for a worker running in its own process."""
+    # The parent coordinates shutdown on Ctrl+C; a direct SIGTERM stops only
+    # this worker, after its current job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker = Worker(Database(db_path), shutdown_event)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.start()
 
 class WorkerManager:
     """Manages multiple worker processes."""
@@ -121,13 +228,36 @@ class WorkerManager:
         self.db = db
         self.workers: List[Worker] = []
         self.worker_threads: List[Thread] = []
-        
+        self.worker_processes: List[multiprocessing.Process] = []
+        # Created on first process start so other commands skip the semaphore
+        self.stop_event = None
+        self._stopping = False
+
+    def start_workers(self, count: int = 1, mode: str = "process"):
+        """Start the specified number of worker processes (or threads)."""
         # Set up signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
 
-    def start_workers(self, count: int = 1):
-        """Start the specified number of worker processes."""
+        if mode == "process":
+            if self.stop_event is None:
+                self.stop_event = multiprocessing.Event()
+            # A forked child must not inherit an open SQLite connection: it
+            # would share the parent's locks and file descriptors instead of
+            # taking its own, so close ours across the forks.
+            self.db.close()
+            try:
+                for _ in range(count):
+                    process = multiprocessing.Process(
+                        target=_run_worker,
+                        args=(self.db.db_path, self.stop_event)
+                    )
+                    self.worker_processes.append(process)
+                    process.start()
+            finally:
+                self.db.reopen()
+            return
+
         for _ in range(count):
             worker = Worker(self.db)
             thread = Thread(target=worker.start)
@@ -136,25 +266,46 @@ class WorkerManager:
             self.worker_threads.append(thread)
             thread.start()
 
+    def wait_for_workers(self):
+        """Block until every started worker has exited.
+
+        Worker processes need this manager (and its stop event) alive until
+        they finish; under the spawn start method they unpickle the event
+        only after start() returns.
+        """
+        for process in list(self.worker_processes):
+            process.join()
+        for thread in list(self.worker_threads):
+            thread.join()
+
+        self.workers = []
+        self.worker_threads = []
+        self.worker_processes = []
+
+        if self._stopping:
+            logger.info("All workers stopped")
+
     def stop_workers(self):
         """Stop all workers gracefully."""
+        self._request_stop()
+        self.wait_for_workers()
+
+    def _request_stop(self):
+        """Tell every worker to stop after its current job; safe to repeat."""
+        if self._stopping:
+            return
+        self._stopping = True
         logger.info("Stopping all workers...")
         
-        # Signal all workers to stop
+        if self.stop_event is not None:
+            self.stop_event.set()
         for worker in self.workers:
             worker.stop()
-            
-        # Wait for all threads to finish
-        for thread in self.worker_threads:
-            thread.join()
-            
-        self.workers = []
-        self.worker_threads = []
-        
-        logger.info("All workers stopped")
 
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals."""
+        # Only raise the stop flags here. Joining from a handler can re-enter
+        # an in-progress join when signals arrive back to back; the main
+        # flow's wait_for_workers() does the waiting.
         logger.info(f"Received signal {signum}")
-        self.stop_workers()
-        sys.exit(0)
\ No newline at end of file
+        self._request_stop()
\ No newline at end of file
@@ -1,4 +1,6 @@
 """Demo script to validate core functionality."""
+import contextlib
+import io
 import json
 import os
 import subprocess
@@ -6,23 +8,27 @@ import sys
 import time
 from datetime import datetime
 
-def run_command(cmd):
-    """Run queuectl command and return output."""
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    return result.stdout.strip()
+from queue.cli import CLI
+
+def run_command(cli, args):
+    """Run a queuectl command in-process and return its output."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            cli.run(args)
+        except SystemExit:
+            pass
+    return output.getvalue().strip()
 
 def main():
     """Run demo scenarios."""
     print("\n=== QueueCTL Demo ===\n")
 
     # Ensure we start fresh
-    if os.path.exists("jobs.db"):
-        os.remove("jobs.db")
+    for path in ("jobs.db", "jobs.db-wal", "jobs.db-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    cli = CLI()
 
     # Test 1: Basic successful job
     print("\n1. Testing basic successful job...")
@@ -30,7 +36,7 @@ def main():
         "id": "job1",
         "command": "echo Hello World"
     }
-    run_command(f'python queuectl.py enqueue \'{json.dumps(job)}\'')
+    run_command(cli, ["enqueue", json.dumps(job)])
     
     # Start worker
     print("\nStarting worker...")
@@ -43,7 +49,7 @@ def main():
     # Wait for job to complete
     time.sleep(2)
     print("\nChecking job status...")
-    print(run_command("python queuectl.py list"))
+    print(run_command(cli, ["list"]))
 
     # Test 2: Failed job with retry
     print("\n2. Testing failed job with retry...")
@@ -52,12 +58,12 @@ def main():
         "command": "nonexistent_command",
         "max_retries": 2
     }
-    run_command(f'python queuectl.py enqueue \'{json.dumps(job)}\'')
+    run_command(cli, ["enqueue", json.dumps(job)])
     
     # Wait for retries and DLQ
     time.sleep(5)
     print("\nChecking DLQ...")
-    print(run_command("python queuectl.py dlq list"))
+    print(run_command(cli, ["dlq", "list"]))
 
     # Test 3: Multiple workers
     print("\n3. Testing multiple workers...")
@@ -71,7 +77,7 @@ def main():
             "id": f"multi{i}",
             "command": f"echo Job {i} && sleep 2"
         }
-        run_command(f'python queuectl.py enqueue \'{json.dumps(job)}\'')
+        run_command(cli, ["enqueue", json.dumps(job)])
     
     # Start multiple workers
     print("\nStarting 3 workers...")
@@ -84,7 +90,7 @@ def main():
     # Wait for jobs to complete
     time.sleep(4)
     print("\nFinal status:")
-    print(run_command("python queuectl.py status"))
+    print(run_command(cli, ["status"]))
     
     # Clean up
     worker_process.terminate()